@@ -48,7 +48,6 @@ from ops.pebble import APIError, PathError
 from requests import Session
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util import Retry  # type: ignore
-from yaml.parser import ParserError
 
 logger = logging.getLogger(__name__)
 
@@ -644,11 +643,13 @@ class GrafanaAgentCharm(CharmBase):
             # charm container CA cert
             Path(self._ca_path).unlink(missing_ok=True)
 
-        config = self._generate_config()
+        # yaml.dump sorts keys, so the rendered text is stable and can be compared against the
+        # file as-is instead of parsing the old config back.
+        config = yaml.dump(self._generate_config())
 
         try:
-            old_config = yaml.safe_load(self.read_file(CONFIG_PATH))
-        except (FileNotFoundError, PathError, ParserError):
+            old_config = self.read_file(CONFIG_PATH)
+        except (FileNotFoundError, PathError):
             # File does not yet exist? Processing a deferred event?
             old_config = None
 
@@ -658,7 +659,7 @@ class GrafanaAgentCharm(CharmBase):
             return
 
         try:
-            self.write_file(CONFIG_PATH, yaml.dump(config))
+            self.write_file(CONFIG_PATH, config)
             # FIXME: change this to self._reload_config when #19 is fixed
             # Restart the service to pick up the new config
             self.restart()
@@ -1,30 +1,19 @@
+import pytest
 from ops.testing import Container, State
 
 containers = [Container(name="agent", can_connect=True)]
 
 
-def test_reporting_enabled(ctx):
-    # GIVEN the "reporting_enabled" config option is set to True
-    state = State(leader=True, config={"reporting_enabled": True}, containers=containers)
-
-    # WHEN config-changed fires
-    out = ctx.run(ctx.on.config_changed(), state)
-
-    # THEN the service layer does NOT include the "-disable-reporting" arg
-    assert (
-        "-disable-reporting"
-        not in out.get_container("agent").layers["agent"].services["agent"].command
+@pytest.mark.parametrize("reporting_enabled", (True, False))
+def test_reporting_enabled(ctx, reporting_enabled):
+    # GIVEN the "reporting_enabled" config option is set
+    state = State(
+        leader=True, config={"reporting_enabled": reporting_enabled}, containers=containers
     )
 
-
-def test_reporting_disabled(ctx):
-    # GIVEN the "reporting_enabled" config option is set to False
-    state = State(leader=True, config={"reporting_enabled": False}, containers=containers)
     # WHEN config-changed fires
     out = ctx.run(ctx.on.config_changed(), state)
 
-    # THEN the service layer INCLUDES the "-disable-reporting" arg
-    assert (
-        "-disable-reporting"
-        in out.get_container("agent").layers["agent"].services["agent"].command
-    )
+    # THEN the service layer includes the "-disable-reporting" arg only if reporting is disabled
+    command = out.get_container("agent").layers["agent"].services["agent"].command
+    assert ("-disable-reporting" in command) is not reporting_enabled
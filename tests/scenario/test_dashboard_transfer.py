@@ -14,11 +14,12 @@ def test_dashboard_propagation(ctx):
     # This test verifies that if the charm receives a dashboard via the requirer databag,
     # it is correctly transferred to the provider databag.
 
-    content_in = encode_as_dashboard({"hello": "world"})
+    dashboard = {"hello": "world"}
+    content_in = encode_as_dashboard(dashboard)
     expected = {
         "charm": "some-test-charm",
         "title": "file:some-mock-dashboard",
-        "content": content_in,
+        "content": dashboard,
     }
     data = {
         "templates": {
@@ -42,4 +43,4 @@ def test_dashboard_propagation(ctx):
         dash = mgr.charm.dashboards[0]
         assert dash["charm"] == expected["charm"]
         assert dash["title"] == expected["title"]
-        assert dash["content"] == json.loads(LZMABase64.decompress(expected["content"]))
+        assert dash["content"] == expected["content"]
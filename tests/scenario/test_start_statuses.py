@@ -1,19 +1,10 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
-import dataclasses
-
 from ops import pebble
-from ops.testing import Container, Exec, State, UnknownStatus
-
-
-@dataclasses.dataclass
-class _MockProc:
-    returncode: int = 0
-    stdout: str = ""
+from ops.testing import BlockedStatus, Container, Exec, State, UnknownStatus
 
-
-def _subp_run_mock(*a, **kw):
-    return _MockProc(0)
+# Exec is a frozen dataclass, so the execs can be built once at import time.
+AGENT_EXECS = frozenset({Exec(["/bin/agent", "-version"], return_code=0, stdout="42.42")})
 
 
 def test_install(ctx):
@@ -23,18 +14,20 @@ def test_install(ctx):
 
 def test_start(ctx):
     out = ctx.run(ctx.on.start(), state=State())
-    assert out.unit_status.name == "unknown"
+    assert out.unit_status == UnknownStatus()
 
 
 def test_charm_start_with_container(ctx):
     agent = Container(
         name="agent",
         can_connect=True,
-        execs={Exec(["/bin/agent", "-version"], return_code=0, stdout="42.42")},
+        execs=AGENT_EXECS,
     )
 
     out = ctx.run(ctx.on.pebble_ready(agent), state=State(containers=[agent]))
 
-    assert out.unit_status.name == "blocked"
+    assert out.unit_status == BlockedStatus(
+        "Missing incoming ('requires') relation: metrics-endpoint|logging-provider|tracing-provider|grafana-dashboards-consumer"
+    )
     agent_out = out.get_container("agent")
     assert agent_out.services["agent"].current == pebble.ServiceStatus.ACTIVE
@@ -15,6 +15,36 @@ from ops.testing import Container, Context, Relation, State
 from charm import GrafanaAgentK8sCharm
 from grafana_agent import CONFIG_PATH
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader  # type: ignore
+
+# CONFIG_PATH relative to the root of a container's simulated filesystem
+CONFIG_PATH_PARTS = CONFIG_PATH.strip("/").split("/")
+
+
+# Scenario relations are frozen, so the same instances can be shared by every test
+TRACING_PROVIDER = Relation(
+    "tracing-provider",
+    remote_app_data=TracingRequirerAppData(receivers=["otlp_http", "otlp_grpc"]).dump(),
+)
+TRACING = Relation(
+    "tracing",
+    remote_app_data=TracingProviderAppData(
+        receivers=[
+            Receiver(protocol={"name": "otlp_grpc", "type": "grpc"}, url="http:foo.com:1111")
+        ]
+    ).dump(),
+)
+
+
+def _agent_config(ctx, agent: Container) -> dict:
+    """Load the grafana agent config rendered into the agent container."""
+    gagent_config = agent.get_filesystem(ctx).joinpath(*CONFIG_PATH_PARTS)
+    assert gagent_config.exists()
+    return yaml.load(gagent_config.read_text(), Loader=SafeLoader)
+
 
 @pytest.fixture
 def ctx():
@@ -40,107 +70,54 @@ def base_state():
 
 def test_tracing_relation(ctx, base_state):
     # GIVEN a tracing relation over the tracing-provider endpoint
-    tracing_provider = Relation(
-        "tracing-provider",
-        remote_app_data=TracingRequirerAppData(receivers=["otlp_http", "otlp_grpc"]).dump(),
-    )
-    tracing = Relation(
-        "tracing",
-        remote_app_data=TracingProviderAppData(
-            receivers=[
-                Receiver(protocol={"name": "otlp_grpc", "type": "grpc"}, url="http:foo.com:1111")
-            ]
-        ).dump(),
-    )
-
-    state = dataclasses.replace(base_state, relations=[tracing, tracing_provider])
+    state = dataclasses.replace(base_state, relations=[TRACING, TRACING_PROVIDER])
     # WHEN we process any setup event for the relation
-    state_out = ctx.run(ctx.on.relation_changed(tracing_provider), state)
+    state_out = ctx.run(ctx.on.relation_changed(TRACING_PROVIDER), state)
 
     agent = state_out.get_container("agent")
 
     # THEN the agent has started
     assert agent.services["agent"].is_running()
     # AND the grafana agent config has a traces config section
-    fs = agent.get_filesystem(ctx)
-    gagent_config = fs.joinpath(*CONFIG_PATH.strip("/").split("/"))
-    assert gagent_config.exists()
-    yml = yaml.safe_load(gagent_config.read_text())
+    yml = _agent_config(ctx, agent)
     assert yml["traces"]["configs"][0], yml.get("traces", "<no traces config>")
 
 
 def test_tracing_provider_without_tracing(ctx, base_state):
     # GIVEN a tracing relation over the tracing-provider endpoint
-    tracing = Relation(
-        "tracing-provider",
-        remote_app_data=TracingRequirerAppData(receivers=["otlp_http", "otlp_grpc"]).dump(),
-    )
-
-    state = dataclasses.replace(base_state, relations=[tracing])
+    state = dataclasses.replace(base_state, relations=[TRACING_PROVIDER])
     # WHEN we process any setup event for the relation
-    state_out = ctx.run(ctx.on.relation_changed(tracing), state)
+    state_out = ctx.run(ctx.on.relation_changed(TRACING_PROVIDER), state)
 
     agent = state_out.get_container("agent")
 
     # THEN the agent has started
     assert agent.services["agent"].is_running()
     # AND the grafana agent config has an empty traces config section
-    fs = agent.get_filesystem(ctx)
-    gagent_config = fs.joinpath(*CONFIG_PATH.strip("/").split("/"))
-    assert gagent_config.exists()
-    yml = yaml.safe_load(gagent_config.read_text())
+    yml = _agent_config(ctx, agent)
     assert yml["traces"] == {}
 
 
 def test_tracing_relations_in_and_out(ctx, base_state):
     # GIVEN a tracing relation over the tracing-provider endpoint and one over tracing
-    tracing_provider = Relation(
-        "tracing-provider",
-        remote_app_data=TracingRequirerAppData(receivers=["otlp_http", "otlp_grpc"]).dump(),
-    )
-    tracing = Relation(
-        "tracing",
-        remote_app_data=TracingProviderAppData(
-            receivers=[
-                Receiver(protocol={"name": "otlp_grpc", "type": "grpc"}, url="http:foo.com:1111")
-            ]
-        ).dump(),
-    )
-
-    state = dataclasses.replace(base_state, relations=[tracing, tracing_provider])
+    state = dataclasses.replace(base_state, relations=[TRACING, TRACING_PROVIDER])
     # WHEN we process any setup event for the relation
-    state_out = ctx.run(ctx.on.relation_changed(tracing), state)
+    state_out = ctx.run(ctx.on.relation_changed(TRACING), state)
 
     agent = state_out.get_container("agent")
 
     # THEN the agent has started
     assert agent.services["agent"].is_running()
     # AND the grafana agent config has a traces config section
-    fs = agent.get_filesystem(ctx)
-    gagent_config = fs.joinpath(*CONFIG_PATH.strip("/").split("/"))
-    assert gagent_config.exists()
-    yml = yaml.safe_load(gagent_config.read_text())
+    yml = _agent_config(ctx, agent)
     assert yml["traces"]
 
 
 def test_tracing_relation_passthrough(ctx, base_state):
     # GIVEN a tracing relation over the tracing-provider endpoint and one over tracing
-    tracing_provider = Relation(
-        "tracing-provider",
-        remote_app_data=TracingRequirerAppData(receivers=["otlp_http", "otlp_grpc"]).dump(),
-    )
-    tracing = Relation(
-        "tracing",
-        remote_app_data=TracingProviderAppData(
-            receivers=[
-                Receiver(protocol={"name": "otlp_grpc", "type": "grpc"}, url="http:foo.com:1111")
-            ]
-        ).dump(),
-    )
-
-    state = dataclasses.replace(base_state, relations=[tracing, tracing_provider])
+    state = dataclasses.replace(base_state, relations=[TRACING, TRACING_PROVIDER])
     # WHEN we process any setup event for the relation
-    state_out = ctx.run(ctx.on.relation_changed(tracing), state)
+    state_out = ctx.run(ctx.on.relation_changed(TRACING), state)
 
     # THEN we act as a tracing provider for 'tracing-provider', and as requirer for 'tracing'
     tracing_out = TracingRequirerAppData.load(state_out.get_relations("tracing")[0].local_app_data)
@@ -168,27 +145,14 @@ def test_tracing_relation_passthrough(ctx, base_state):
 )
 def test_tracing_relation_passthrough_with_force_enable(ctx, base_state, force_enable):
     # GIVEN a tracing relation over the tracing-provider endpoint and one over tracing
-    tracing_provider = Relation(
-        "tracing-provider",
-        remote_app_data=TracingRequirerAppData(receivers=["otlp_http", "otlp_grpc"]).dump(),
-    )
-    tracing = Relation(
-        "tracing",
-        remote_app_data=TracingProviderAppData(
-            receivers=[
-                Receiver(protocol={"name": "otlp_grpc", "type": "grpc"}, url="http:foo.com:1111")
-            ]
-        ).dump(),
-    )
-
     # AND given we're configured to always enable some protocols
     state = dataclasses.replace(
         base_state,
         config={f"always_enable_{proto}": True for proto in force_enable},
-        relations=[tracing, tracing_provider],
+        relations=[TRACING, TRACING_PROVIDER],
     )
     # WHEN we process any setup event for the relation
-    state_out = ctx.run(ctx.on.relation_changed(tracing), state)
+    state_out = ctx.run(ctx.on.relation_changed(TRACING), state)
 
     # THEN we act as a tracing provider for 'tracing-provider', and as requirer for 'tracing'
     tracing_out = TracingRequirerAppData.load(state_out.get_relations("tracing")[0].local_app_data)
@@ -216,31 +180,15 @@ def test_tracing_relation_passthrough_with_force_enable(ctx, base_state, force_e
 )
 def test_tracing_sampling_config_is_present(ctx, base_state, sampling_config):
     # GIVEN a tracing relation over the tracing-provider endpoint and one over tracing
-    tracing_provider = Relation(
-        "tracing-provider",
-        remote_app_data=TracingRequirerAppData(receivers=["otlp_http", "otlp_grpc"]).dump(),
-    )
-    tracing = Relation(
-        "tracing",
-        remote_app_data=TracingProviderAppData(
-            receivers=[
-                Receiver(protocol={"name": "otlp_grpc", "type": "grpc"}, url="http:foo.com:1111")
-            ]
-        ).dump(),
-    )
-
     state = dataclasses.replace(
-        base_state, relations=[tracing, tracing_provider], config=sampling_config
+        base_state, relations=[TRACING, TRACING_PROVIDER], config=sampling_config
     )
     # WHEN we process any setup event for the relation
-    state_out = ctx.run(ctx.on.relation_changed(tracing), state)
+    state_out = ctx.run(ctx.on.relation_changed(TRACING), state)
 
     agent = state_out.get_container("agent")
 
     # THEN the grafana agent config has a traces tail_sampling section with default values
-    fs = agent.get_filesystem(ctx)
-    gagent_config = fs.joinpath(*CONFIG_PATH.strip("/").split("/"))
-    assert gagent_config.exists()
-    yml = yaml.safe_load(gagent_config.read_text())
+    yml = _agent_config(ctx, agent)
 
     assert yml["traces"]["configs"][0]["tail_sampling"]
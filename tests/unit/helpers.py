@@ -1,6 +1,21 @@
 # Copyright 2022 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Type
+from unittest.mock import patch
+
+import yaml
+from ops.model import Container
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader  # type: ignore
+
 
 class FakeProcessVersionCheck:
     def __init__(self, args):
@@ -8,3 +23,50 @@ class FakeProcessVersionCheck:
 
     def wait_output(self):
         return ("v0.1.0", "")
+
+
+def load_yaml(text: str):
+    """Safe-load a YAML document, using the libyaml-backed loader when available."""
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def start_class_patches(cls: Type[unittest.TestCase]) -> None:
+    """Patch out the agent restart and the model uuid check for a whole test class.
+
+    Meant to be called from setUpClass: unlike class-level @patch decorators, which only wrap
+    test* methods, patchers started there are also active during setUp.
+    """
+    for patcher in (
+        patch.object(Container, "restart", new=lambda x, y: True),
+        patch(
+            "charms.observability_libs.v0.juju_topology.JujuTopology.is_valid_uuid",
+            lambda *args: True,
+        ),
+    ):
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+
+
+def use_scratch_charm_paths(case: unittest.TestCase) -> Path:
+    """Point the charm's rules and dashboards paths at a fresh temporary tree for one test.
+
+    Only the source directories are created: the charm creates or replaces the destinations
+    itself, both in __init__ and whenever it rewrites rules or dashboards. The tree and the
+    patches are cleaned up with the test.
+    """
+    scratch = Path(tempfile.mkdtemp())
+    case.addCleanup(shutil.rmtree, scratch, ignore_errors=True)
+    paths = {}
+    for kind in ("METRICS_RULES", "LOKI_RULES", "DASHBOARDS"):
+        src = scratch / f"{kind.lower()}_src"
+        src.mkdir()
+        paths[f"{kind}_SRC_PATH"] = str(src)
+        paths[f"{kind}_DEST_PATH"] = str(scratch / f"{kind.lower()}_dest")
+
+    for patcher in (
+        patch("grafana_agent.GrafanaAgentCharm.charm_dir", Path("/")),
+        *(patch(f"grafana_agent.{name}", path) for name, path in paths.items()),
+    ):
+        patcher.start()
+        case.addCleanup(patcher.stop)
+    return scratch
@@ -6,12 +6,15 @@
 
 import json
 import pathlib
-import tempfile
 import unittest
 from unittest.mock import patch
 
-import yaml
-from helpers import FakeProcessVersionCheck
+from helpers import (
+    FakeProcessVersionCheck,
+    load_yaml,
+    start_class_patches,
+    use_scratch_charm_paths,
+)
 from ops.model import Container
 from ops.testing import Harness
 
@@ -94,22 +97,19 @@ LOKI_ALERT_RULES = {
     ]
 }
 
+# Relation data payloads, encoded once for all tests.
+PROMETHEUS_ALERT_RULES_JSON = json.dumps(PROMETHEUS_ALERT_RULES)
+LOKI_ALERT_RULES_JSON = json.dumps(LOKI_ALERT_RULES)
+
 
-@patch.object(Container, "restart", new=lambda x, y: True)
-@patch("charms.observability_libs.v0.juju_topology.JujuTopology.is_valid_uuid", lambda *args: True)
 class TestAlertIngestion(unittest.TestCase):
-    @patch("grafana_agent.GrafanaAgentCharm.charm_dir", pathlib.Path("/"))
-    @patch("grafana_agent.METRICS_RULES_SRC_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.METRICS_RULES_DEST_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.LOKI_RULES_SRC_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.LOKI_RULES_DEST_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.DASHBOARDS_SRC_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.DASHBOARDS_DEST_PATH", tempfile.mkdtemp())
-    @patch(
-        "charms.observability_libs.v0.juju_topology.JujuTopology.is_valid_uuid", lambda *args: True
-    )
+    @classmethod
+    def setUpClass(cls):
+        start_class_patches(cls)
+
     @patch.object(Container, "exec", new=FakeProcessVersionCheck)
     def setUp(self):
+        use_scratch_charm_paths(self)
         self.harness = Harness(GrafanaAgentK8sCharm)
         self.addCleanup(self.harness.cleanup)
         self.harness.set_model_info(name="lma", uuid="20ed9535-c14a-4ec9-a250-fd7a6414feb5")
@@ -117,39 +117,40 @@ class TestAlertIngestion(unittest.TestCase):
         self.harness.begin_with_initial_hooks()
         self.metrics_path = self.harness.charm.metrics_rules_paths
         self.loki_path = self.harness.charm.loki_rules_paths
-        self.harness.container_pebble_ready("agent")
+
+    def assert_topology_in_first_rule(self, rules: dict, group_suffix: str, labels: set):
+        """Check the first rule of the group whose name ends with `group_suffix`."""
+        group = next((g for g in rules["groups"] if g["name"].endswith(group_suffix)), None)
+        if group is None:
+            self.fail("Could not find the correct alert rule to check")
+        rule = group["rules"][0]
+        self.assertIn("juju_model", rule["expr"])
+        self.assertIn("juju_model_uuid", rule["expr"])
+        self.assertIn("juju_application", rule["expr"])
+        self.assertNotIn("juju_unit", rule["expr"])
+        self.assertEqual(set(rule["labels"]), labels)
 
 
 class TestPrometheusRules(TestAlertIngestion):
     def test_consumes_prometheus_rules(self):
-        rel_id = self.harness.add_relation("metrics-endpoint", "provider")
-        self.harness.add_relation_unit(rel_id, "provider/0")
-        self.harness.update_relation_data(
-            rel_id, "provider", {"alert_rules": json.dumps(PROMETHEUS_ALERT_RULES)}
+        # app_data also adds the remote unit provider/0.
+        self.harness.add_relation(
+            "metrics-endpoint", "provider", app_data={"alert_rules": PROMETHEUS_ALERT_RULES_JSON}
         )
 
-        rule_files = [f for f in pathlib.Path(self.metrics_path.dest).iterdir() if f.is_file()]
-
-        rules = yaml.safe_load(rule_files[0].read_text())
-        for group in rules["groups"]:
-            if group["name"].endswith("provider-tester_alerts"):
-                expr = group["rules"][0]["expr"]
-                self.assertIn("juju_model", expr)
-                self.assertIn("juju_model_uuid", expr)
-                self.assertIn("juju_application", expr)
-                self.assertNotIn("juju_unit", expr)
-                self.assertEqual(
-                    set(group["rules"][0]["labels"]),
-                    {
-                        "juju_application",
-                        "juju_model",
-                        "juju_model_uuid",
-                        "severity",
-                    },
-                )
-                break
-        else:
-            assert False  # Could not find the correct alert rule to check
+        rule_file = next(f for f in pathlib.Path(self.metrics_path.dest).iterdir() if f.is_file())
+
+        rules = load_yaml(rule_file.read_text())
+        self.assert_topology_in_first_rule(
+            rules,
+            "provider-tester_alerts",
+            {
+                "juju_application",
+                "juju_model",
+                "juju_model_uuid",
+                "severity",
+            },
+        )
 
     def test_forwards_prometheus_rules(self):
         rel_id = self.harness.add_relation("metrics-endpoint", "provider")
@@ -159,64 +160,45 @@ class TestPrometheusRules(TestAlertIngestion):
         self.harness.add_relation_unit(prom_id, "prom/0")
 
         self.harness.update_relation_data(
-            rel_id, "provider", {"alert_rules": json.dumps(PROMETHEUS_ALERT_RULES)}
+            rel_id, "provider", {"alert_rules": PROMETHEUS_ALERT_RULES_JSON}
         )
 
         data = self.harness.get_relation_data(prom_id, self.harness.model.app.name)
         rules = json.loads(data["alert_rules"])
 
-        for group in rules["groups"]:
-            if group["name"].endswith("provider_tester_alerts"):
-                expr = group["rules"][0]["expr"]
-                self.assertIn("juju_model", expr)
-                self.assertIn("juju_model_uuid", expr)
-                self.assertIn("juju_application", expr)
-                self.assertNotIn("juju_unit", expr)
-                self.assertEqual(
-                    set(group["rules"][0]["labels"]),
-                    {
-                        "juju_application",
-                        "juju_model",
-                        "juju_charm",
-                        "juju_model_uuid",
-                        "severity",
-                    },
-                )
-                break
-        else:
-            assert False  # Could not find the correct alert rule to check
+        self.assert_topology_in_first_rule(
+            rules,
+            "provider_tester_alerts",
+            {
+                "juju_application",
+                "juju_model",
+                "juju_charm",
+                "juju_model_uuid",
+                "severity",
+            },
+        )
 
 
 class TestLokiRules(TestAlertIngestion):
     def test_consumes_loki_rules(self):
-        rel_id = self.harness.add_relation("logging-provider", "consumer")
-        self.harness.add_relation_unit(rel_id, "consumer/0")
-        self.harness.update_relation_data(
-            rel_id, "consumer", {"alert_rules": json.dumps(LOKI_ALERT_RULES)}
+        # app_data also adds the remote unit consumer/0.
+        self.harness.add_relation(
+            "logging-provider", "consumer", app_data={"alert_rules": LOKI_ALERT_RULES_JSON}
         )
 
-        rule_files = [f for f in pathlib.Path(self.loki_path.dest).iterdir() if f.is_file()]
-
-        rules = yaml.safe_load(rule_files[0].read_text())
-        for group in rules["groups"]:
-            if group["name"].endswith("provider-tester_alerts"):
-                expr = group["rules"][0]["expr"]
-                self.assertIn("juju_model", expr)
-                self.assertIn("juju_model_uuid", expr)
-                self.assertIn("juju_application", expr)
-                self.assertNotIn("juju_unit", expr)
-                self.assertEqual(
-                    set(group["rules"][0]["labels"]),
-                    {
-                        "juju_application",
-                        "juju_model",
-                        "juju_model_uuid",
-                        "severity",
-                    },
-                )
-                break
-        else:
-            assert False  # Could not find the correct alert rule to check
+        rule_file = next(f for f in pathlib.Path(self.loki_path.dest).iterdir() if f.is_file())
+
+        rules = load_yaml(rule_file.read_text())
+        self.assert_topology_in_first_rule(
+            rules,
+            "provider-tester_alerts",
+            {
+                "juju_application",
+                "juju_model",
+                "juju_model_uuid",
+                "severity",
+            },
+        )
 
     def test_forwards_loki_rules(self):
         rel_id = self.harness.add_relation("logging-provider", "consumer")
@@ -226,29 +208,20 @@ class TestLokiRules(TestAlertIngestion):
         self.harness.add_relation_unit(loki_id, "loki/0")
 
         self.harness.update_relation_data(
-            rel_id, "consumer", {"alert_rules": json.dumps(LOKI_ALERT_RULES)}
+            rel_id, "consumer", {"alert_rules": LOKI_ALERT_RULES_JSON}
         )
 
         data = self.harness.get_relation_data(loki_id, self.harness.model.app.name)
         rules = json.loads(data["alert_rules"])
 
-        for group in rules["groups"]:
-            if group["name"].endswith("provider-tester_alerts_alerts"):
-                expr = group["rules"][0]["expr"]
-                self.assertIn("juju_model", expr)
-                self.assertIn("juju_model_uuid", expr)
-                self.assertIn("juju_application", expr)
-                self.assertNotIn("juju_unit", expr)
-                self.assertEqual(
-                    set(group["rules"][0]["labels"]),
-                    {
-                        "juju_application",
-                        "juju_model",
-                        "juju_model_uuid",
-                        "juju_charm",
-                        "severity",
-                    },
-                )
-                break
-        else:
-            assert False  # Could not find the correct alert rule to check
+        self.assert_topology_in_first_rule(
+            rules,
+            "provider-tester_alerts_alerts",
+            {
+                "juju_application",
+                "juju_model",
+                "juju_model_uuid",
+                "juju_charm",
+                "severity",
+            },
+        )
@@ -11,11 +11,13 @@ from charm import GrafanaAgentK8sCharm as GrafanaAgentCharm
 
 
 class TestRelationStatus(unittest.TestCase):
-    def setUp(self, *unused):
+    @classmethod
+    def setUpClass(cls):
         patcher = patch.object(GrafanaAgentCharm, "_agent_version", property(lambda *_: "0.0.0"))
-        self.mock_version = patcher.start()
-        self.addCleanup(patcher.stop)
+        cls.mock_version = patcher.start()
+        cls.addClassCleanup(patcher.stop)
 
+    def setUp(self, *unused):
         self.harness = Harness(GrafanaAgentCharm)
         self.harness.set_model_name(self.__class__.__name__)
 
@@ -42,10 +44,8 @@ class TestRelationStatus(unittest.TestCase):
         ]:
             with self.subTest(incoming=incoming, outgoing=outgoing):
                 # WHEN an incoming relation is added
-                rel_incoming_id = self.harness.add_relation(incoming, "incoming")
-                self.harness.add_relation_unit(rel_incoming_id, "incoming/0")
-                self.harness.update_relation_data(
-                    rel_incoming_id, "incoming/0", {"sample": "value"}
+                rel_incoming_id = self.harness.add_relation(
+                    incoming, "incoming", unit_data={"sample": "value"}
                 )
 
                 # THEN the charm goes into blocked status
@@ -2,23 +2,24 @@
 # See LICENSE file for licensing details.
 
 import json
-import tempfile
 import unittest
-from pathlib import Path
 from typing import Any, Dict
 from unittest.mock import patch
 
 import ops.testing
-import responses
-import yaml
-from deepdiff import DeepDiff  # type: ignore
-from helpers import FakeProcessVersionCheck
+from helpers import (
+    FakeProcessVersionCheck,
+    load_yaml,
+    start_class_patches,
+    use_scratch_charm_paths,
+)
 from ops.model import ActiveStatus, Container
 from ops.testing import Harness
 
 from charm import (  # isort: skip <- needed because charm.py does not always exist
     GrafanaAgentK8sCharm,
 )
+from grafana_agent import CONFIG_PATH
 
 ops.testing.SIMULATE_CAN_CONNECT = True
 
@@ -39,6 +40,18 @@ SCRAPE_JOBS = [
     },
 ]
 
+# Relation data payloads, encoded once rather than on every update_relation_data call.
+SCRAPE_METADATA_JSON = json.dumps(SCRAPE_METADATA)
+SCRAPE_JOBS_JSON = json.dumps(SCRAPE_JOBS)
+REMOTE_WRITE_JSON = {
+    "prometheus/0": json.dumps(
+        {"url": "http://1.1.1.1:9090/api/v1/write", "tls_config": {"insecure_skip_verify": False}}
+    ),
+    "prometheus/1": json.dumps(
+        {"url": "http://1.1.1.2:9090/api/v1/write", "tls_config": {"insecure_skip_verify": False}}
+    ),
+}
+
 REWRITE_CONFIGS = [
     {
         "target_label": "job",
@@ -77,127 +90,119 @@ REWRITE_CONFIGS = [
     },
 ]
 
-CERTS_RELATION_DATA = """[{"certificate": "-----BEGIN CERTIFICATE-----foobarcert-----END CERTIFICATE-----", "certificate_signing_request": "-----BEGIN CERTIFICATE REQUEST-----foobarcsr-----END CERTIFICATE REQUEST-----", "ca": "-----BEGIN CERTIFICATE-----foobarca-----END CERTIFICATE-----", "chain": ["-----BEGIN CERTIFICATE-----foobarchain0-----END CERTIFICATE-----", "-----BEGIN CERTIFICATE-----foobarchain1-----END CERTIFICATE-----"]}]"""
+EXPECTED_REMOTE_WRITE_CONFIG: Dict[str, Any] = {
+    "integrations": {
+        "agent": {
+            "enabled": True,
+            "relabel_configs": REWRITE_CONFIGS,
+        },
+        "prometheus_remote_write": [
+            {
+                "url": "http://1.1.1.2:9090/api/v1/write",
+                "tls_config": {"insecure_skip_verify": False},
+            },
+            {
+                "url": "http://1.1.1.1:9090/api/v1/write",
+                "tls_config": {"insecure_skip_verify": False},
+            },
+        ],
+    },
+    "metrics": {
+        "wal_directory": "/tmp/agent/data",
+        "configs": [
+            {
+                "name": "agent_scraper",
+                "remote_write": [
+                    {
+                        "url": "http://1.1.1.2:9090/api/v1/write",
+                        "tls_config": {"insecure_skip_verify": False},
+                    },
+                    {
+                        "url": "http://1.1.1.1:9090/api/v1/write",
+                        "tls_config": {"insecure_skip_verify": False},
+                    },
+                ],
+                "scrape_configs": [],
+            }
+        ],
+    },
+    "server": {"log_level": "info"},
+    "logs": {},
+    "traces": {},
+}
+
+CERTS_RELATION_DATA = json.dumps(
+    [
+        {
+            "certificate": "-----BEGIN CERTIFICATE-----foobarcert-----END CERTIFICATE-----",
+            "certificate_signing_request": "-----BEGIN CERTIFICATE REQUEST-----foobarcsr-----END CERTIFICATE REQUEST-----",
+            "ca": "-----BEGIN CERTIFICATE-----foobarca-----END CERTIFICATE-----",
+            "chain": [
+                "-----BEGIN CERTIFICATE-----foobarchain0-----END CERTIFICATE-----",
+                "-----BEGIN CERTIFICATE-----foobarchain1-----END CERTIFICATE-----",
+            ],
+        }
+    ]
+)
+
+
+def canonicalize(obj: Any) -> Any:
+    """Return a copy of `obj` with all lists sorted, for order-insensitive comparisons."""
+    if isinstance(obj, dict):
+        return {k: canonicalize(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return sorted((canonicalize(v) for v in obj), key=lambda v: json.dumps(v, sort_keys=True))
+    return obj
 
 
-@patch.object(Container, "restart", new=lambda x, y: True)
-@patch("charms.observability_libs.v0.juju_topology.JujuTopology.is_valid_uuid", lambda *args: True)
 class TestScrapeConfiguration(unittest.TestCase):
-    @patch("grafana_agent.GrafanaAgentCharm.charm_dir", Path("/"))
-    @patch("grafana_agent.METRICS_RULES_SRC_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.METRICS_RULES_DEST_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.LOKI_RULES_SRC_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.LOKI_RULES_DEST_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.DASHBOARDS_SRC_PATH", tempfile.mkdtemp())
-    @patch("grafana_agent.DASHBOARDS_DEST_PATH", tempfile.mkdtemp())
-    @patch(
-        "charms.observability_libs.v0.juju_topology.JujuTopology.is_valid_uuid", lambda *args: True
-    )
+    @classmethod
+    def setUpClass(cls):
+        start_class_patches(cls)
+
     @patch.object(Container, "exec", new=FakeProcessVersionCheck)
     def setUp(self):
+        use_scratch_charm_paths(self)
         self.harness = Harness(GrafanaAgentK8sCharm)
         self.addCleanup(self.harness.cleanup)
         self.harness.set_model_info(name="lma", uuid=SAMPLE_UUID)
         self.harness.set_leader(True)
         self.harness.begin_with_initial_hooks()
-        self.harness.container_pebble_ready("agent")
+        self.agent_container = self.harness.charm.unit.get_container("agent")
 
-    @responses.activate
-    def test_remote_write_configuration(self):
-        responses.add(
-            responses.POST,
-            "http://localhost/-/reload",
-            status=200,
-        )
-
-        agent_container = self.harness.charm.unit.get_container("agent")
+    def rendered_config(self) -> Dict[str, Any]:
+        """Return the agent config currently pushed into the agent container."""
+        return load_yaml(self.agent_container.pull(CONFIG_PATH).read())
 
+    def test_remote_write_configuration(self):
         # Add incoming relation
         rel_incoming_id = self.harness.add_relation("metrics-endpoint", "agent")
         self.harness.add_relation_unit(rel_incoming_id, "agent/0")
 
         rel_id = self.harness.add_relation("send-remote-write", "prometheus")
 
-        self.harness.add_relation_unit(rel_id, "prometheus/0")
-        self.harness.update_relation_data(
-            rel_id,
-            "prometheus/0",
-            {
-                "remote_write": json.dumps(
-                    {
-                        "url": "http://1.1.1.1:9090/api/v1/write",
-                        "tls_config": {"insecure_skip_verify": False},
-                    }
-                )
-            },
-        )
+        # Only the state with both units is asserted on, so join both units quietly and let the
+        # final relation-changed do a single reconcile that picks up both endpoints.
+        with self.harness.hooks_disabled():
+            self.harness.add_relation_unit(rel_id, "prometheus/0")
+            self.harness.update_relation_data(
+                rel_id, "prometheus/0", {"remote_write": REMOTE_WRITE_JSON["prometheus/0"]}
+            )
+            self.harness.add_relation_unit(rel_id, "prometheus/1")
 
-        self.harness.add_relation_unit(rel_id, "prometheus/1")
         self.harness.update_relation_data(
-            rel_id,
-            "prometheus/1",
-            {
-                "remote_write": json.dumps(
-                    {
-                        "url": "http://1.1.1.2:9090/api/v1/write",
-                        "tls_config": {"insecure_skip_verify": False},
-                    }
-                )
-            },
+            rel_id, "prometheus/1", {"remote_write": REMOTE_WRITE_JSON["prometheus/1"]}
         )
 
-        expected_config: Dict[str, Any] = {
-            "integrations": {
-                "agent": {
-                    "enabled": True,
-                    "relabel_configs": REWRITE_CONFIGS,
-                },
-                "prometheus_remote_write": [
-                    {
-                        "url": "http://1.1.1.2:9090/api/v1/write",
-                        "tls_config": {"insecure_skip_verify": False},
-                    },
-                    {
-                        "url": "http://1.1.1.1:9090/api/v1/write",
-                        "tls_config": {"insecure_skip_verify": False},
-                    },
-                ],
-            },
-            "metrics": {
-                "wal_directory": "/tmp/agent/data",
-                "configs": [
-                    {
-                        "name": "agent_scraper",
-                        "remote_write": [
-                            {
-                                "url": "http://1.1.1.2:9090/api/v1/write",
-                                "tls_config": {"insecure_skip_verify": False},
-                            },
-                            {
-                                "url": "http://1.1.1.1:9090/api/v1/write",
-                                "tls_config": {"insecure_skip_verify": False},
-                            },
-                        ],
-                        "scrape_configs": [],
-                    }
-                ],
-            },
-            "server": {"log_level": "info"},
-            "logs": {},
-            "traces": {},
-        }
-
-        config = yaml.safe_load(agent_container.pull("/etc/grafana-agent.yaml").read())
+        config = self.rendered_config()
 
-        self.assertEqual(
-            DeepDiff(expected_config, self.harness.charm._generate_config(), ignore_order=True), {}
-        )
+        self.assertEqual(canonicalize(EXPECTED_REMOTE_WRITE_CONFIG), canonicalize(config))
         self.assertIsInstance(self.harness.model.unit.status, ActiveStatus)
 
         # Test scale down
         self.harness.remove_relation_unit(rel_id, "prometheus/1")
 
-        config = yaml.safe_load(agent_container.pull("/etc/grafana-agent.yaml").read())
+        config = self.rendered_config()
 
         self.assertEqual(
             config["integrations"]["prometheus_remote_write"],
@@ -221,34 +226,22 @@ class TestScrapeConfiguration(unittest.TestCase):
         # Test scale to zero
         self.harness.remove_relation_unit(rel_id, "prometheus/0")
 
-        config = yaml.safe_load(agent_container.pull("/etc/grafana-agent.yaml").read())
+        config = self.rendered_config()
 
         self.assertEqual(config["integrations"]["prometheus_remote_write"], [])
         self.assertEqual(config["metrics"]["configs"][0]["remote_write"], [])
 
-    @responses.activate
     def test_scrape_without_remote_write_configuration(self):
-        agent_container = self.harness.charm.unit.get_container("agent")
-
-        responses.add(
-            responses.POST,
-            "http://localhost/-/reload",
-            status=200,
-        )
-
-        rel_id = self.harness.add_relation("metrics-endpoint", "foo")
-
-        self.harness.add_relation_unit(rel_id, "foo/0")
-        self.harness.update_relation_data(
-            rel_id,
-            "foo/0",
-            {
-                "scrape_metadata": json.dumps(SCRAPE_METADATA),
-                "scrape_jobs": json.dumps(SCRAPE_JOBS),
+        self.harness.add_relation(
+            "metrics-endpoint",
+            "foo",
+            unit_data={
+                "scrape_metadata": SCRAPE_METADATA_JSON,
+                "scrape_jobs": SCRAPE_JOBS_JSON,
             },
         )
 
-        config = yaml.safe_load(agent_container.pull("/etc/grafana-agent.yaml").read())
+        config = self.rendered_config()
         self.assertDictEqual(
             config["integrations"],
             {
@@ -260,18 +253,6 @@ class TestScrapeConfiguration(unittest.TestCase):
             },
         )
 
-    def test_cli_args(self):
-        expected = "-config.file=/etc/grafana-agent.yaml"
-        self.assertEqual(self.harness.charm._cli_args(), expected)
-
-    def test_cli_args_with_tls(self):
-        rel_id = self.harness.add_relation("certificates", "certs")
-        self.harness.add_relation_unit(rel_id, "certs/0")
-        expected = (
-            "-config.file=/etc/grafana-agent.yaml -server.http.enable-tls -server.grpc.enable-tls"
-        )
-        self.assertEqual(self.harness.charm._cli_args(), expected)
-
     # Leaving this test here as we need to use it again when we figure out how to
     # fix _reload_config.
 
@@ -285,10 +266,13 @@ class TestScrapeConfiguration(unittest.TestCase):
     def test_loki_config_with_and_without_loki_endpoints(self):
         rel_id = self.harness.add_relation("logging-consumer", "loki")
 
-        for u in range(2):
-            self.harness.add_relation_unit(rel_id, f"loki/{u}")
-            endpoint = json.dumps({"url": f"http://loki{u}:3100:/loki/api/v1/push"})
-            self.harness.update_relation_data(rel_id, f"loki/{u}", {"endpoint": endpoint})
+        # _loki_config reads the relation data directly, so there's no need to reconcile the
+        # charm after every unit is added.
+        with self.harness.hooks_disabled():
+            for u in range(2):
+                self.harness.add_relation_unit(rel_id, f"loki/{u}")
+                endpoint = json.dumps({"url": f"http://loki{u}:3100:/loki/api/v1/push"})
+                self.harness.update_relation_data(rel_id, f"loki/{u}", {"endpoint": endpoint})
 
         expected = {
             "configs": [
@@ -319,9 +303,7 @@ class TestScrapeConfiguration(unittest.TestCase):
             ],
             "positions_directory": "/run/grafana-agent-positions",
         }
-        self.assertEqual(
-            DeepDiff(expected, self.harness.charm._loki_config, ignore_order=True), {}
-        )
+        self.assertEqual(canonicalize(expected), canonicalize(self.harness.charm._loki_config))
 
         self.harness.remove_relation(rel_id)
         self.assertEqual({}, self.harness.charm._loki_config)
@@ -337,3 +319,69 @@ class TestScrapeConfiguration(unittest.TestCase):
                 if scrape_config.get("loki_push_api"):
                     self.assertIn("http_tls_config", scrape_config["loki_push_api"]["server"])
                     self.assertIn("grpc_tls_config", scrape_config["loki_push_api"]["server"])
+
+    def test_update_config_skips_restart_when_nothing_changed(self):
+        # GIVEN the config rendered by the initial hooks
+        charm = self.harness.charm
+        before = self.agent_container.pull(CONFIG_PATH).read()
+
+        # WHEN the charm reconciles again without any change to relations or config
+        with patch.object(charm, "write_file", wraps=charm.write_file) as write_file:
+            with patch.object(charm, "restart") as restart:
+                charm._update_config()
+
+        # THEN the config file is left alone and the agent is not restarted
+        write_file.assert_not_called()
+        restart.assert_not_called()
+        self.assertEqual(before, self.agent_container.pull(CONFIG_PATH).read())
+
+    def test_update_config_rewrites_and_restarts_on_change(self):
+        # GIVEN a remote-write endpoint that the rendered config does not know about yet
+        charm = self.harness.charm
+        with self.harness.hooks_disabled():
+            self.harness.add_relation(
+                "send-remote-write",
+                "prometheus",
+                unit_data={"remote_write": REMOTE_WRITE_JSON["prometheus/0"]},
+            )
+
+        # WHEN the charm reconciles
+        with patch.object(charm, "restart") as restart:
+            charm._update_config()
+
+        # THEN the new endpoint is written out and the agent is restarted to pick it up
+        restart.assert_called_once()
+        self.assertEqual(
+            self.rendered_config()["integrations"]["prometheus_remote_write"],
+            [
+                {
+                    "url": "http://1.1.1.1:9090/api/v1/write",
+                    "tls_config": {"insecure_skip_verify": False},
+                }
+            ],
+        )
+
+
+class TestCliArgs(unittest.TestCase):
+    """_cli_args only reads config and relation shape, so no initial hooks are needed."""
+
+    def setUp(self):
+        use_scratch_charm_paths(self)
+        self.harness = Harness(GrafanaAgentK8sCharm)
+        self.addCleanup(self.harness.cleanup)
+        self.harness.set_model_info(name="lma", uuid=SAMPLE_UUID)
+        self.harness.set_leader(True)
+        self.harness.begin()
+
+    def test_cli_args(self):
+        expected = "-config.file=/etc/grafana-agent.yaml"
+        self.assertEqual(self.harness.charm._cli_args(), expected)
+
+    def test_cli_args_with_tls(self):
+        with self.harness.hooks_disabled():
+            rel_id = self.harness.add_relation("certificates", "certs")
+            self.harness.add_relation_unit(rel_id, "certs/0")
+        expected = (
+            "-config.file=/etc/grafana-agent.yaml -server.http.enable-tls -server.grpc.enable-tls"
+        )
+        self.assertEqual(self.harness.charm._cli_args(), expected)